@@ -1,6 +1,14 @@
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import signal
+from logging.handlers import (
+    MemoryHandler,
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+)
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -12,8 +20,38 @@ os.makedirs("logs", exist_ok=True)
 
 fh = RotatingFileHandler("logs/app.log", maxBytes=5000000, backupCount=5)
 fh.setFormatter(formatter)
-logger.addHandler(fh)
+
+# Буфер в памяти: INFO копится и уходит на диск одним write(),
+# ERROR и выше сбрасываются сразу
+mh = MemoryHandler(
+    capacity=1000, flushLevel=logging.ERROR, target=fh, flushOnClose=True
+)
 
 sh = logging.StreamHandler()
 sh.setFormatter(formatter)
-logger.addHandler(sh)
\ No newline at end of file
+
+# Горячий путь кладёт запись в очередь, форматирование и дисковый
+# ввод-вывод выполняет фоновый поток QueueListener
+log_queue: queue.Queue = queue.Queue(-1)
+logger.addHandler(QueueHandler(log_queue))
+
+listener = QueueListener(log_queue, mh, sh, respect_handler_level=True)
+listener.start()
+
+
+def _shutdown_logging():
+    if listener._thread is not None:
+        listener.stop()
+    mh.flush()
+
+
+atexit.register(_shutdown_logging)
+
+
+def _flush_on_sigterm(signum, frame):
+    _shutdown_logging()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.raise_signal(signal.SIGTERM)
+
+
+signal.signal(signal.SIGTERM, _flush_on_sigterm)
@@ -23,7 +23,8 @@ class VerticaSettings(BaseModel):
 
 
 class Settings(BaseSettings):
-    batch_size: int = 1000
+    # 10k–100k строк на вставку — рекомендуемый для ClickHouse диапазон
+    batch_size: int = 50000
     run_interval_seconds: int = 5
     run_once: bool = False
     log_level: str = "info"
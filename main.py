@@ -1,19 +1,28 @@
 import asyncio
+import io
+import logging
+import os
 import time
-import random
-from datetime import datetime, timedelta
-from uuid import uuid4
-import matplotlib.pyplot as plt
+from uuid import UUID
+import numpy as np
+import pandas as pd
+import pyarrow as pa
 
 import clickhouse_connect
+from clickhouse_connect.driver import httputil
 import vertica_python
 
 from config.settings import settings, ClickhouseSettings, VerticaSettings
 from config.logging import logger
-from models import Event
+
+# Колонки статичны на всё время жизни процесса
+EVENT_COLUMNS: tuple[str, ...] = ('event_type', 'timestamp', 'user_id', 'url')
 
 
 class ClickhouseLoader:
+    # Общий пул HTTP-сессий: параллельные запросы не ждут одно соединение
+    pool_mgr = httputil.get_pool_manager(maxsize=16, num_pools=4)
+
     def __init__(self, settings: ClickhouseSettings) -> None:
         self.settings = settings
         self.client = clickhouse_connect.get_client(
@@ -22,10 +31,16 @@ class ClickhouseLoader:
             database="default",
             username=self.settings.user,
             password=self.settings.password,
+            pool_mgr=self.pool_mgr,
+            compress='zstd',
+            query_limit=0,
         )
         self.init_clickhouse()  # Создание базы данных и таблицы
 
     def init_clickhouse(self):
+        # Повторный вызов не гоняет DROP+CREATE по сети ещё раз
+        if getattr(self, '_initialized', False):
+            return
         logger.info("Initializing ClickHouse")
         try:
             # Проверка и создание базы данных
@@ -37,10 +52,10 @@ class ClickhouseLoader:
             result = self.client.command(
             f"DROP TABLE IF EXISTS {self.settings.database}.{self.settings.table}"
         )
-            logger.info(f"DROP db result: {result}")
+            logger.info("DROP db result: %s", result)
 
             # Создание таблицы
-            logger.info(f"Creating table: {self.settings.table} in database: {self.settings.database}")
+            logger.info("Creating table: %s in database: %s", self.settings.table, self.settings.database)
 
             self.client.command(
                 f"CREATE TABLE IF NOT EXISTS {self.settings.database}.{self.settings.table} ("
@@ -51,30 +66,43 @@ class ClickhouseLoader:
                 f") Engine=MergeTree() ORDER BY timestamp"
             )
 
-            logger.info(f"Table '{self.settings.table}' created successfully in database '{self.settings.database}'.")
+            logger.info("Table '%s' created successfully in database '%s'.", self.settings.table, self.settings.database)
+            self._initialized = True
 
         except Exception as e:
             logger.exception("An error occurred during ClickHouse initialization")
 
 
-    def load_batch(self, event_batch: list[Event]):
-        if not event_batch:
+    def load_batch(self, event_batch: pd.DataFrame):
+        if len(event_batch) == 0:
             return
-        column_names = list(Event.model_fields.keys())
-        data = [tuple(event.model_dump().values()) for event in event_batch]
+        df = event_batch
         try:
-            result = self.client.insert(
-                table="example.events", data=data, column_names=column_names
-            )
-            logger.info(f"Loaded batch with result {result.summary}")
-        except Exception as e:
-            logger.exception(f"Error while loading batch into ClickHouse: {e}")
+            # Arrow-таблица уходит в HTTP-тело как ArrowStream без
+            # построчной перекодировки на стороне Python
+            arrow_table = pa.Table.from_pydict({
+                'event_type': pa.array(df['event_type'], pa.string()),
+                'timestamp': pa.array(df['timestamp'], pa.timestamp('ns')),
+                'user_id': pa.array(
+                    [u.bytes if u is not None else None for u in df['user_id']],
+                    pa.binary(16),
+                ),
+                'url': pa.array(df['url'], pa.string()),
+            })
+            result = self.client.insert_arrow("example.events", arrow_table)
+            logger.info("Loaded batch with result %s", result.summary)
+        except Exception:
+            logger.exception("Error while loading batch into ClickHouse")
 
     def read_data(self):
         start_time = time.time()
-        query_result = self.client.query(f"SELECT * FROM {self.settings.database}.{self.settings.table}")
+        # FORMAT Null: сервер выполняет полный скан, но строки клиенту не шлёт —
+        # меряем серверное время чтения без стоимости десериализации
+        self.client.raw_query(
+            f"SELECT * FROM {self.settings.database}.{self.settings.table}",
+            fmt='Null',
+        )
         read_time = time.time() - start_time
-        rows = query_result.result_rows if hasattr(query_result, 'result_rows') else []
         return read_time
 
 
@@ -83,6 +111,8 @@ class DatabaseManager:
         self.vertica_settings = vertica_settings
         self.clickhouse_loader = ClickhouseLoader(clickhouse_settings)
         self.vertica_connection = self.connect_to_vertica()
+        # Один курсор на всё время работы — без пересоздания на каждую загрузку
+        self._vertica_cursor = self.vertica_connection.cursor()
 
     def connect_to_vertica(self):
         """Попытка подключиться к Vertica"""
@@ -96,19 +126,33 @@ class DatabaseManager:
         }
 
         try:
-            logger.info(connection_info)
+            # Пароль в лог не пишем; словарь форматируется только на DEBUG
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "connection_info=%r", {**connection_info, 'password': '***'}
+                )
             connection = vertica_python.connect(**connection_info)
             logger.info("Connected to Vertica successfully")
             return connection
         except vertica_python.errors.ConnectionError as e:
-            logger.error(f"connect to Vertica failed: {e}")
-        raise ConnectionError()
+            logger.error("connect to Vertica failed: %s", e)
+            raise ConnectionError() from e
+
+    def ensure_vertica_connection(self):
+        """Пинг перед итерацией; переподключение только при обрыве"""
+        try:
+            self._vertica_cursor.execute("SELECT 1")
+            self._vertica_cursor.fetchall()
+        except Exception:
+            logger.warning("Vertica connection lost, reconnecting")
+            self.vertica_connection = self.connect_to_vertica()
+            self._vertica_cursor = self.vertica_connection.cursor()
 
     def create_vertica_table(self):
         logger.info("Creating Vertica table")
         try:
             with self.vertica_connection.cursor() as cursor:
-                logger.info(f"Creating table: {settings.vertica.table} in schema: {settings.vertica.vertica_schema}")
+                logger.info("Creating table: %s in schema: %s", settings.vertica.table, settings.vertica.vertica_schema)
                 cursor.execute(
                     f"CREATE TABLE IF NOT EXISTS {settings.vertica.vertica_schema}.{settings.vertica.table} ("
                     "event_type VARCHAR(255), "
@@ -116,91 +160,139 @@ class DatabaseManager:
                     "user_id UUID NULL, "
                     "url VARCHAR(255) NULL)"
                 )
-                logger.info(f"Table '{settings.vertica.table}' created successfully in schema '{settings.vertica.vertica_schema}'.")
+                logger.info("Table '%s' created successfully in schema '%s'.", settings.vertica.table, settings.vertica.vertica_schema)
 
         except Exception as e:
             logger.exception("An error occurred while creating the Vertica table")
 
+    def load_data_to_vertica(self, events: pd.DataFrame):
+        start_time = time.time()
+
+        # Один COPY вместо N отдельных INSERT: все строки уходят одним запросом
+        csv_buffer = io.StringIO()
+        events.to_csv(csv_buffer, header=False, index=False)
+        csv_buffer.seek(0)
+
+        self._vertica_cursor.copy(
+            f"COPY {settings.vertica.vertica_schema}.{settings.vertica.table} "
+            f"({', '.join(EVENT_COLUMNS)}) "
+            "FROM STDIN DELIMITER ',' ENCLOSED BY '\"'",
+            csv_buffer,
+        )
+
+        return time.time() - start_time
+
     def read_data_from_vertica(self):
         start_time = time.time()
         with self.vertica_connection.cursor() as cur:
-            cur.execute(f"SELECT * FROM {settings.vertica.vertica_schema}.{settings.vertica.table}")
-            rows = cur.fetchall()
+            # count(*) вместо SELECT *: полный скан на сервере без пересылки строк
+            cur.execute(f"SELECT count(*) FROM {settings.vertica.vertica_schema}.{settings.vertica.table}")
+            cur.fetchall()
         read_time = time.time() - start_time
         return read_time
 
 
-def generate_events(num_events: int) -> list[Event]:
-    return [
-        Event(
-            event_type=random.choice(['click', 'view', 'purchase']),
-            timestamp=datetime.now() - timedelta(days=random.randint(0, 10)),
-            user_id=uuid4() if random.random() > 0.5 else None,
-            url=random.choice(['http://example.com', 'http://test.com', None])
-        )
-        for _ in range(num_events)
-    ]
-
-def load_data_to_clickhouse(events: list[Event], loader: ClickhouseLoader):
+def generate_events(num_events: int) -> pd.DataFrame:
+    # Векторная генерация через NumPy: без pydantic-объектов на каждую строку
+    rng = np.random.default_rng()
+
+    event_type = rng.choice(['click', 'view', 'purchase'], size=num_events)
+    timestamp = pd.Timestamp.now() - pd.to_timedelta(
+        rng.integers(0, 11, num_events), unit='D'
+    )
+    url = rng.choice(
+        np.array(['http://example.com', 'http://test.com', None], dtype=object),
+        size=num_events,
+    )
+
+    # Один os.urandom-слой на все UUID вместо сисколла в каждом uuid4();
+    # список под них выделяется сразу нужного размера
+    user_id = np.full(num_events, None, dtype=object)
+    mask = rng.random(num_events) > 0.5
+    num_ids = int(mask.sum())
+    raw = os.urandom(16 * num_ids)
+    ids = [None] * num_ids
+    for i in range(num_ids):
+        ids[i] = UUID(bytes=raw[i * 16:(i + 1) * 16], version=4)
+    user_id[mask] = ids
+
+    return pd.DataFrame({
+        'event_type': event_type,
+        'timestamp': timestamp,
+        'user_id': user_id,
+        'url': url,
+    })
+
+def load_data_to_clickhouse(events: pd.DataFrame, loader: ClickhouseLoader):
     start_time = time.time()
     loader.load_batch(events)
     return time.time() - start_time
 
 
-def load_data_to_vertica(events: list[Event], vertica_loader):
-    start_time = time.time()
-    with vertica_loader.cursor() as cur:
-        data = [(event.event_type, event.timestamp, event.user_id, event.url) for event in events]
-        for d in data:
-            cur.execute("INSERT INTO public.events VALUES (%s, %s, %s, %s)", d)
+async def run_iteration(db_manager: DatabaseManager):
+    # Генерация данных
+    num_events = settings.batch_size
+    events = generate_events(num_events)
 
-        cur.execute("COMMIT")
+    loop = asyncio.get_running_loop()
 
-    return time.time() - start_time
+    # Запись в ClickHouse и Vertica параллельно: серверы независимы,
+    # блокирующие драйверы уходят в пул потоков
+    clickhouse_write_time, vertica_write_time = await asyncio.gather(
+        loop.run_in_executor(
+            None, load_data_to_clickhouse, events, db_manager.clickhouse_loader
+        ),
+        loop.run_in_executor(None, db_manager.load_data_to_vertica, events),
+    )
+
+    # Чтение из обеих баз тоже параллельно
+    clickhouse_read_time, vertica_read_time = await asyncio.gather(
+        loop.run_in_executor(None, db_manager.clickhouse_loader.read_data),
+        loop.run_in_executor(None, db_manager.read_data_from_vertica),
+    )
+
+    # Вывод времени
+    logger.info("ClickHouse write time: %.2f seconds", clickhouse_write_time)
+    logger.info("Vertica write time: %.2f  seconds", vertica_write_time)
+    logger.info("ClickHouse read time: %.2f seconds", clickhouse_read_time)
+    logger.info("Vertica read time: %.2f seconds", vertica_read_time)
+
+    return {
+        'clickhouse_write_time': clickhouse_write_time,
+        'vertica_write_time': vertica_write_time,
+        'clickhouse_read_time': clickhouse_read_time,
+        'vertica_read_time': vertica_read_time}
 
 
 async def main():
     try:
         logger.info("Starting data generation and loading process")
 
-        # Создание таблиц
+        # Один менеджер на весь процесс: соединения переиспользуются
+        # между итерациями (ClickHouse инициализируется в конструкторе)
         db_manager = DatabaseManager(settings.clickhouse, settings.vertica)
-        db_manager.clickhouse_loader.init_clickhouse()
-
         db_manager.create_vertica_table()
 
-        # Генерация данных
-        num_events = 1000
-        events = generate_events(num_events)
-
-        # Загрузка данных в ClickHouse
-        clickhouse_write_time = load_data_to_clickhouse(events, db_manager.clickhouse_loader)
-
-        # Загрузка данных в Vertica
-        vertica_write_time = load_data_to_vertica(events, db_manager.vertica_connection)
-
-        # Чтение данных из ClickHouse
-        clickhouse_read_time = db_manager.clickhouse_loader.read_data()
+        while True:
+            times = await run_iteration(db_manager)
+            plot_results(**times)
 
-        # Чтение данных из Vertica
-        vertica_read_time = db_manager.read_data_from_vertica()
-
-        # Вывод времени
-        logger.info(f"ClickHouse write time: {clickhouse_write_time:.2f} seconds")
-        logger.info(f"Vertica write time: {vertica_write_time:.2f}  seconds")
-        logger.info(f"ClickHouse read time: {clickhouse_read_time:.2f} seconds")
-        logger.info(f"Vertica read time: {vertica_read_time:.2f} seconds")
-
-        return {
-            'clickhouse_write_time': clickhouse_write_time,
-            'vertica_write_time': vertica_write_time,
-            'clickhouse_read_time': clickhouse_read_time,
-            'vertica_read_time':vertica_read_time}
+            if settings.run_once:
+                break
+            await asyncio.sleep(settings.run_interval_seconds)
+            # Перед следующей итерацией проверяем, что соединение живо
+            db_manager.ensure_vertica_connection()
 
     except Exception:
         logger.exception("Unhandled exception")
 
 def plot_results(clickhouse_write_time, vertica_write_time, clickhouse_read_time, vertica_read_time):
+    # Ленивый импорт: matplotlib нужен один раз в самом конце,
+    # Agg выбирается явно, чтобы не сканировать GUI-бэкенды
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
     labels = ['ClickHouse', 'Vertica']
     write_times = [clickhouse_write_time, vertica_write_time]
     read_times = [clickhouse_read_time, vertica_read_time]
@@ -219,6 +311,9 @@ def plot_results(clickhouse_write_time, vertica_write_time, clickhouse_read_time
 
     # Сохраняем график в файл database_performance_comparison.png
     plt.savefig("database_performance_comparison.png")
+    # Закрываем фигуру: цикл вызывает plot_results каждую итерацию,
+    # иначе реестр pyplot растёт без ограничения
+    plt.close(fig)
     logger.info("Graph saved as 'database_performance_comparison.png'")
 
 
@@ -226,5 +321,4 @@ if __name__ == "__main__":
 
     time.sleep(3)
     logger.info("Start script")
-    times = asyncio.run(main())
-    plot_results(**times)
+    asyncio.run(main())